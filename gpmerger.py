@@ -1,4 +1,5 @@
 import sys
+import asyncio
 import argparse
 import warnings
 import logging
@@ -27,8 +28,8 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 
 # deferred importing due to logging setup
-from src.concattools import ConcatBackend, concatenate_bulk
-from src.filetools import crawl, parse_filepath, accumulate_filenumberwise
+from src.concattools import ConcatBackend, plan_jobs, concatenate_jobs
+from src.filetools import crawl, accumulate_filenumberwise
 from src.reporttools import TIMESTAMP_FORMAT, build_table_report, build_tree_report
 
 
@@ -46,6 +47,8 @@ def create_root() -> argparse.ArgumentParser:
                         help='Set the file content report styling. Defaults to \'table\'.', default='table')
     parser.add_argument('-b', '--backend', choices=['mp4merge', 'ffmpeg'], default='ffmpeg', type=str,
                         help='Set the concatenation backend. Defaults to \'ffmpeg\'.')
+    parser.add_argument('--batch', action='store_true', help='Merge many filenumbers via a single ffmpeg process '
+                                                              'with multiple outputs.')
     return parser
     
 
@@ -113,8 +116,7 @@ def main():
     timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
 
     directory_content = crawl(source)
-    videopaths = directory_content['video']
-    fileinfos = [parse_filepath(p) for p in videopaths]
+    fileinfos = directory_content['video']
 
     accumulated = accumulate_filenumberwise(fileinfos)
 
@@ -130,9 +132,12 @@ def main():
     console.print('')
     console.print(report)
 
+    # planning is purely in-memory - the prompt stays on the main thread to remain interruptible
+    jobs = plan_jobs(accumulated, target)
+
     if args.yes:
-        timedelta, result = concatenate_bulk(accumulated, target_directory=target,
-                                             backend=backend, console=console)
+        timedelta, result = asyncio.run(concatenate_jobs(jobs, backend=backend, console=console,
+                                                         force=args.force, batch=args.batch))
         
     else:
         userinput = select_action_cli(console=console)
@@ -154,9 +159,13 @@ def main():
         console.print(f'[light_coral]Deselected filenumbers: [bold]{deselected}[/bold][/light_coral]')
         console.print(f'[yellow]Futile input filenumbers: [bold]{futile}[/bold][/yellow]')
 
-        accumulated_selected = {key : accumulated[key] for key in selected}
-        timedelta, result = concatenate_bulk(accumulated_selected, target_directory=target,
-                                                backend=backend, console=console)
+        # selection is a subset of the candidates: equal size means everything was selected
+        if len(selected) == len(jobs):
+            jobs_selected = jobs
+        else:
+            jobs_selected = {key : jobs[key] for key in selected}
+        timedelta, result = asyncio.run(concatenate_jobs(jobs_selected, backend=backend, console=console,
+                                                         force=args.force, batch=args.batch))
     
     console.rule(title=f'Summary')
     console.print(f'Total duration: {timedelta}')
@@ -4,7 +4,12 @@ gyroscopic metadata streams.
 
 @js 2023
 """
+import os
 import enum
+import dataclasses
+import functools
+import asyncio
+import contextlib
 import subprocess
 import tempfile
 import warnings
@@ -21,18 +26,34 @@ from src.filetools import FileInfo
 
 logger = logging.getLogger('main.concattools')
 
-# load core configuration settings
+# core configuration settings are loaded lazily on first use
 CONF_PATH = Path('./conf.toml')
 
-assert CONF_PATH.exists(), 'missing required configuration file'
-with open(CONF_PATH, mode='rb') as handle:
-    CONF = tomllib.load(handle)
 
-FFMPEG_PATH: Path = Path(CONF['binaries']['FFMPEG'])
-MP4MERGE_PATH: Path = Path(CONF['binaries']['MP4MERGE'])
+@functools.lru_cache(maxsize=None)
+def _conf() -> dict:
+    """Load and cache the core configuration file."""
+    if not CONF_PATH.exists():
+        raise FileNotFoundError(f'missing required configuration file \'{CONF_PATH}\'')
+    with open(CONF_PATH, mode='rb') as handle:
+        conf = tomllib.load(handle)
+    logger.debug(f'loaded configuration from \'{CONF_PATH}\'')
+    return conf
 
-logger.debug(f'set \'FFMPEG_PATH\' = \'{FFMPEG_PATH}\'')
-logger.debug(f'set \'MP4MERGE_PATH\' = \'{MP4MERGE_PATH}\'')
+
+def ffmpeg_path() -> Path:
+    """Path to the FFMPEG executable as set in the configuration file."""
+    return Path(_conf()['binaries']['FFMPEG'])
+
+
+def mp4merge_path() -> Path:
+    """Path to the mp4merge executable as set in the configuration file."""
+    return Path(_conf()['binaries']['MP4MERGE'])
+
+
+# concatenation is stream copying and thus mostly disk-bound: limit the number of
+# simultaneously running backend processes to avoid disk thrashing
+MAX_CONCURRENT_JOBS: int = min(4, os.cpu_count() or 1)
 
 
 class ConcatBackend(enum.Enum):
@@ -40,36 +61,111 @@ class ConcatBackend(enum.Enum):
     FFMPEG = 'ffmpeg'
 
 
-def concatenate_mp4merge(paths: Iterable[Path, str], target: Path | str) -> subprocess.CompletedProcess:
+async def _run_backend(*argv: str, log_path: Path, input: bytes | None = None) -> asyncio.subprocess.Process:
+    """
+    Run a backend executable to completion.
+    Backend output is discarded unless debug logging is enabled, in which case
+    stderr is appended to the log file at `log_path`.
+    Raises `CalledProcessError` on nonzero exit status.
+    """
+    with contextlib.ExitStack() as stack:
+        if logger.isEnabledFor(logging.DEBUG):
+            stderr = stack.enter_context(open(log_path, mode='ab'))
+        else:
+            stderr = asyncio.subprocess.DEVNULL
+        stdin = asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL
+        process = await asyncio.create_subprocess_exec(
+            *argv, stdin=stdin, stdout=asyncio.subprocess.DEVNULL, stderr=stderr
+        )
+        await process.communicate(input=input)
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, argv)
+    return process
+
+
+async def concatenate_mp4merge(paths: Iterable[Path, str], target: Path | str,
+                               force: bool = False) -> asyncio.subprocess.Process:
     """
     Concatenate many MP4 files via `mp4merge` utility.
     Should conserve any gyro- and gravitational metadata.
+    `mp4merge` has no overwrite option: skipping existing targets without
+    `force` is left to the caller.
     """
-    paths = [str(path) for path in paths]
-    retval = subprocess.run(
-        [str(MP4MERGE_PATH), *paths, '--out', str(target)]
-    )
-    return retval
+    paths = list(map(os.fspath, paths))
+    return await _run_backend(os.fspath(mp4merge_path()), *paths, '--out', os.fspath(target),
+                              log_path=Path(target).with_suffix('.log'))
+
+
+# fixed FFMPEG argument sets: concat demuxer reading the file list from stdin and
+# stream copying of video, audio and the gyroscopic metadata (data stream 3)
+_FFMPEG_CONCAT_ARGS: tuple[str, ...] = ('-f', 'concat', '-safe', '0')
+_FFMPEG_INPUT_ARGS: tuple[str, ...] = (*_FFMPEG_CONCAT_ARGS, '-protocol_whitelist', 'pipe,file',
+                                       '-i', 'pipe:0')
+
+
+def _ffmpeg_output_args(index: int) -> tuple[str, ...]:
+    """Output arguments stream copying all relevant streams of the input at `index`."""
+    return ('-c', 'copy', '-map', f'{index}:v', '-map', f'{index}:a', '-map', f'{index}:3',
+            '-copy_unknown')
 
 
-def concatenate_ffmpeg(paths: Iterable[Path, str], target: str | Path) -> subprocess.CompletedProcess:
+_FFMPEG_OUTPUT_ARGS: tuple[str, ...] = _ffmpeg_output_args(0)
+
+# minimum number of jobs for which batch mode spawns a single multi-output FFMPEG process
+FFMPEG_BATCH_THRESHOLD: int = 4
+
+
+def _ffmpeg_overwrite_flag(force: bool) -> str:
+    """
+    Explicit FFMPEG overwrite flag: the interactive prompt is unavailable
+    since stdin carries the file list or is closed.
+    """
+    return '-y' if force else '-n'
+
+
+def _concat_list(paths: Iterable[Path, str]) -> bytes:
+    """
+    Build the file list for the FFMPEG concat demuxer.
+    Entries are absolute 'file:' URLs since the demuxer resolves relative
+    entries against the list location (e.g. 'pipe:0' or a temporary directory).
+    """
+    lines = []
+    for path in paths:
+        url = b'file:' + os.fsencode(os.path.abspath(path))
+        lines.append(b'file \'%s\'\n' % url.replace(b'\'', b'\'\\\'\''))
+    return b''.join(lines)
+
+
+async def concatenate_ffmpeg(paths: Iterable[Path, str], target: str | Path,
+                             force: bool = False) -> asyncio.subprocess.Process:
     """Concatenate MP4 video files with intact metadata via FFMPEG."""
-    # Create video file list as temporary file.
-    data = [
-        f'file \'{str(path)}\'\n'
-        for path in paths
-    ]
-    with tempfile.NamedTemporaryFile(mode='w+', delete=False) as temp_handle:
-        # write file list into temporary file and jump to beginning
-        temp_handle.writelines(data)
-        temp_handle.seek(0)
-        # run FFMPEG concatenation
-        retval = subprocess.run(
-            [str(FFMPEG_PATH), '-f', 'concat', '-safe', '0', '-i', temp_handle.name,
-             '-c', 'copy', '-map', '0:v', '-map', '0:a', '-map', '0:3', '-copy_unknown', str(target)],
-            capture_output=True
-        )
-    return retval
+    # video file list is fed to the concat demuxer via stdin - no temporary file required
+    return await _run_backend(
+        os.fspath(ffmpeg_path()), _ffmpeg_overwrite_flag(force), *_FFMPEG_INPUT_ARGS, *_FFMPEG_OUTPUT_ARGS,
+        os.fspath(target),
+        log_path=Path(target).with_suffix('.log'), input=_concat_list(paths)
+    )
+
+
+async def concatenate_ffmpeg_batch(jobs: Iterable[tuple[Iterable[Path, str], str | Path]],
+                                   log_path: Path, force: bool = False) -> asyncio.subprocess.Process:
+    """
+    Concatenate multiple groups of MP4 video files via a single FFMPEG process
+    with one concat input and one output per (paths, target) group.
+    Saves the per-process startup cost for many short stem files.
+    """
+    inputs: list[str] = []
+    outputs: list[str] = []
+    with tempfile.TemporaryDirectory() as tempdir:
+        # only one stdin is available: file lists are written to the temporary directory
+        for index, (paths, target) in enumerate(jobs):
+            listpath = Path(tempdir) / f'{index}.txt'
+            listpath.write_bytes(_concat_list(paths))
+            inputs.extend((*_FFMPEG_CONCAT_ARGS, '-i', os.fspath(listpath)))
+            outputs.extend((*_ffmpeg_output_args(index), os.fspath(target)))
+        return await _run_backend(os.fspath(ffmpeg_path()), _ffmpeg_overwrite_flag(force), *inputs, *outputs,
+                                  log_path=log_path)
 
 
 backend_to_concat_fn: dict[ConcatBackend, Callable] = {
@@ -78,24 +174,186 @@ backend_to_concat_fn: dict[ConcatBackend, Callable] = {
 }
 
 
+def _resolve_backend(backend: ConcatBackend | str) -> tuple[ConcatBackend, Callable]:
+    """Convert the backend to its enum member and concatenation coroutine function."""
+    try:
+        member = ConcatBackend(backend)
+        return (member, backend_to_concat_fn[member])
+    except (KeyError, ValueError):
+        raise KeyError(f'Invalid file concatenation backend: \'{backend}\'')
+
+
+def get_concat_fn(backend: ConcatBackend | str) -> Callable:
+    """
+    Retrieve the concatenation coroutine function for the backend, given
+    as enum member or its string value.
+    """
+    return _resolve_backend(backend)[1]
+
+
 def concatenate_files(paths: Iterable[Path, str], target: str | Path,
-                      backend: ConcatBackend) -> subprocess.CompletedProcess:
+                      backend: ConcatBackend | str, force: bool = False) -> asyncio.subprocess.Process:
     """
     Concatenate MP4 video files and conserve gyroscopic metadata.
+
+    One-shot dispatcher that resolves the backend and runs its own event loop
+    for every call. For many concatenations, retrieve the backend coroutine
+    function once via `get_concat_fn` or use `concatenate_bulk`.
+    """
+    concatenate = get_concat_fn(backend)
+    return asyncio.run(concatenate(paths=paths, target=target, force=force))
+
+
+@dataclasses.dataclass
+class ConcatJob:
+    """Chapter subfiles of a single stem file and their concatenation target."""
+    paths: list[Path]
+    target: Path
+
+
+def plan_jobs(accumulated_result: dict[str, list[FileInfo]],
+              target_directory: str | Path) -> dict[str, ConcatJob]:
     """
+    Build the concatenation jobs for the accumulated subfiles.
+    Does not touch the file system, thus it is safe to run ahead of
+    the actual concatenation (e.g. while waiting for user input).
+    """
+    target_directory = Path(target_directory)
+    prefix = 'concatenated'
+    jobs: dict[str, ConcatJob] = {}
+    for filenumber, subfiles in accumulated_result.items():
+        target = target_directory / f'{prefix}-{filenumber}.mp4'
+        jobs[filenumber] = ConcatJob(paths=[file.path for file in subfiles], target=target)
+    return jobs
+
+
+def _discard_failed(target: Path, preexisting: bool) -> None:
+    """
+    Remove the partial output of a failed concatenation so that later runs do
+    not skip it as existing. Overwritten preexisting files cannot be restored.
+    """
+    if preexisting:
+        logger.warning(f'overwritten file \'{target}\' may be incomplete')
+    elif target.exists():
+        logger.info(f'removing incomplete concatenation result \'{target}\'')
+        target.unlink()
+
+
+async def _run_jobs(jobs: dict[str, ConcatJob],
+                    concatenate: Callable,
+                    status: Status,
+                    force: bool = False,
+                    max_jobs: int = MAX_CONCURRENT_JOBS) -> list[Path]:
+    """
+    Run the concatenation jobs concurrently with at most `max_jobs`
+    backend processes alive at any time.
+    Returns the targets of the successful jobs. On failure, the partial
+    outputs created by the backend are removed.
+    """
+    semaphore = asyncio.Semaphore(max_jobs)
+    total = len(jobs)
+    finished = 0
+    succeeded: list[Path] = []
+
+    async def run(filenumber: str, job: ConcatJob) -> None:
+        nonlocal finished
+        async with semaphore:
+            preexisting = job.target.exists()
+            try:
+                await concatenate(job.paths, job.target, force=force)
+                succeeded.append(job.target)
+                logger.debug(f'successfully concatenated {job.paths} into {job.target}')
+            except subprocess.CalledProcessError as error:
+                logger.error(f'concatenation into \'{job.target}\' failed with exit status {error.returncode}')
+                _discard_failed(job.target, preexisting)
+            finally:
+                finished += 1
+                status.update(status=f'Concatenated item [italic yellow]{finished}/{total}[/italic yellow] '
+                                     f'@[bold green] stem number {filenumber}[/]')
+
+    await asyncio.gather(*(run(filenumber, job) for filenumber, job in jobs.items()))
+    return succeeded
+
+
+async def _run_batch(jobs: dict[str, ConcatJob], status: Status, force: bool = False) -> list[Path]:
+    """
+    Run the concatenation jobs through a single FFMPEG process.
+    Returns the targets if the process succeeded. On failure, the partial
+    outputs created by the process are removed.
+    """
+    targets = [job.target for job in jobs.values()]
+    preexisting = {target for target in targets if target.exists()}
+    log_path = targets[0].parent / 'concatenated-batch.log'
+    status.update(status=f'Concatenating [italic yellow]{len(jobs)}[/italic yellow] items '
+                         f'@[bold green] stem numbers {", ".join(jobs)}[/]')
     try:
-        concatenate = backend_to_concat_fn[backend]
-    except KeyError:
-        raise KeyError(f'Invalid file concatenation backend: \'{backend}\'')
+        await concatenate_ffmpeg_batch(((job.paths, job.target) for job in jobs.values()), log_path=log_path,
+                                       force=force)
+    except subprocess.CalledProcessError as error:
+        logger.error(f'batch concatenation into {targets} failed with exit status {error.returncode}')
+        for target in targets:
+            _discard_failed(target, target in preexisting)
+        return []
+    logger.debug(f'successfully batch concatenated into {targets}')
+    return targets
+
+
+async def concatenate_jobs(jobs: dict[str, ConcatJob],
+                           backend: ConcatBackend | str = ConcatBackend.FFMPEG,
+                           console: Console | None = None,
+                           force: bool = False,
+                           batch: bool = False
+                           ) -> tuple[timedelta, list[Path]]:
+    """
+    Concurrently run previously planned concatenation jobs.
+    Parameters are analogous to `concatenate_bulk`.
+    """
+    # resolve the backend once for all jobs and before any file system work
+    backend, concatenate = _resolve_backend(backend)
+
+    for directory in {job.target.parent for job in jobs.values()}:
+        if not directory.is_dir():
+            warnings.warn('indicated target directory is not a directory - attempting to create')
+            directory.mkdir(parents=True)
+
+    runnable: dict[str, ConcatJob] = {}
+    for filenumber, job in jobs.items():
+        # checked right before running: planning may have happened long ago
+        if job.target.exists():
+            if force:
+                logger.info(f'overwriting preexisting file with concatenation at \'{job.target}\'')
+            else:
+                logger.warning(f'skipping concatenation with target: \'{job.target}\' - file exists')
+                continue
+        runnable[filenumber] = job
 
-    return concatenate(paths=paths, target=target)
+    t_start = datetime.now()
+
+    if batch:
+        if backend is not ConcatBackend.FFMPEG:
+            logger.info('batch mode is only available for the FFMPEG backend - concatenating per file')
+            batch = False
+        elif len(runnable) < FFMPEG_BATCH_THRESHOLD:
+            logger.info(f'batch mode requires at least {FFMPEG_BATCH_THRESHOLD} files but got '
+                        f'{len(runnable)} - concatenating per file')
+            batch = False
+
+    with Status(status='Starting concatenation ...', console=console) as status:
+        if batch:
+            targets = await _run_batch(runnable, status, force=force)
+        else:
+            targets = await _run_jobs(runnable, concatenate, status, force=force)
+
+    delta = datetime.now() - t_start
+    return (delta, targets)
 
 
 def concatenate_bulk(accumulated_result: dict[str, list[FileInfo]],
                      target_directory: str | Path,
-                     backend: ConcatBackend = ConcatBackend.FFMPEG,
+                     backend: ConcatBackend | str = ConcatBackend.FFMPEG,
                      console: Console | None = None,
                      force: bool = False,
+                     batch: bool = False
                      ) -> tuple[timedelta, list[Path]]:
     """
     Concatenate multiple subfiles to multiple resulting files.
@@ -111,7 +369,7 @@ def concatenate_bulk(accumulated_result: dict[str, list[FileInfo]],
         Resulting monolithic files will be stored there. Filenames are deduced
         from stem filenumber.
 
-    backend : ConcatBackend, optional
+    backend : ConcatBackend or str, optional
         Concatenation backend method identifier. Defaults to 'ConcatBackend.FFMPEG'.
     
     console : Console or None, optional
@@ -119,40 +377,12 @@ def concatenate_bulk(accumulated_result: dict[str, list[FileInfo]],
 
     force : bool, optional
         Set force overwriting behaviour. Defaults to `False`, e.g. no overwriting.
-    """
-    total = len(accumulated_result)
-
-    target_directory = Path(target_directory)
-
-    if not target_directory.is_dir():
-        warnings.warn('indicated target directory is not a directory - attempting to create')
-        target_directory.mkdir(parents=True)
-    
-    prefix = 'concatenated'
-    concatenate = backend_to_concat_fn[backend]
-    targets: list[Path] = []
-
-    t_start = datetime.now()
-
-    with Status(status='Starting concatenation ...', console=console) as status:
-        for i, (filenumber, subfiles) in enumerate(accumulated_result.items(), start=1):
-            target = target_directory / f'{prefix}-{filenumber}.mp4'
-
-            if target.exists():
-                if force:
-                    logger.info(f'overwriting preexisting file with concatenation at \'{target}\'')
-                else:
-                    logger.warning(f'skipping concatenation with target: \'{target}\' - file exists')
-                    continue
-
-            status.update(status=f'Concatenating item [italic yellow]{i}/{total}[/italic yellow] '
-                                 f'@[bold green] stem number {filenumber}[/]')
-            
-            targets.append(target)
-            paths = [file.path for file in subfiles]
-            process_result = concatenate(paths, target)
-            logger.debug(f'successfully concatenated {paths} into {target}')
-
-    delta = datetime.now() - t_start
-    return (delta, targets)
 
+    batch : bool, optional
+        Concatenate all files via a single FFMPEG process with multiple outputs
+        if at least `FFMPEG_BATCH_THRESHOLD` files are requested. Only applies
+        to the FFMPEG backend. Defaults to `False`, e.g. one process per file.
+    """
+    jobs = plan_jobs(accumulated_result, target_directory)
+    return asyncio.run(concatenate_jobs(jobs, backend=backend, console=console, force=force,
+                                        batch=batch))
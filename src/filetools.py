@@ -10,35 +10,13 @@ import warnings
 
 from collections import defaultdict
 from collections.abc import Iterable
-from functools import cached_property
+from operator import attrgetter
 from pathlib import Path
 
 
 VIDEO_SUFFIXES = {'.mp4'}
 THUMBNAIL_SUFFIXES = {'.thm'}
-
-
-def crawl(directory: Path) -> dict[str, list[Path]]:
-    """Crawl the directory and sort results into three categories."""
-    crawlresult = defaultdict(list)
-    for item in directory.iterdir():
-        if not item.is_file():
-            crawlresult['unrecognized'].append(item)
-            continue
-        if item.suffix.lower() in VIDEO_SUFFIXES:
-            crawlresult['video'].append(item)
-        elif item.suffix.lower() in THUMBNAIL_SUFFIXES:
-            crawlresult['thumbnail'].append(item)
-        else:
-            crawlresult['unrecognized'].append(item)
-
-    video_count = len(crawlresult['video'])
-    thumbnail_count = len(crawlresult['thumbnail'])
-    unrecognized_count = len(crawlresult['unrecognized'])
-    logging.info(f'Crawling {directory} returned {video_count} video files, '
-                 f'{thumbnail_count} thumbnails and {unrecognized_count} unrecognized items.')
-    return crawlresult
-
+CODEC_SET = frozenset({'H', 'X'})
 
 
 @dataclasses.dataclass
@@ -49,11 +27,42 @@ class FileInfo:
     number: str
     suffix: str
     path: str | Path | None = None
+    size: int | None = None
+
+
 
-    @cached_property
-    def size(self) -> int:
-        """Return the size of the file in bytes."""
-        return os.path.getsize(self.path)
+def crawl(directory: Path) -> dict[str, list[Path | FileInfo]]:
+    """
+    Crawl the directory and sort results into three categories.
+    Video files are directly parsed into `FileInfo` objects with their size
+    taken from the directory scan and are sorted by file number and chapter.
+    """
+    crawlresult = {'video' : [], 'thumbnail' : [], 'unrecognized' : []}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            # file type and suffix are deduced from the directory entry without additional stat calls
+            if not entry.is_file():
+                crawlresult['unrecognized'].append(Path(entry.path))
+                continue
+            _, dot, extension = entry.name.rpartition('.')
+            suffix = dot + extension.lower()
+            if suffix in VIDEO_SUFFIXES:
+                crawlresult['video'].append(parse_filepath(Path(entry.path), size=entry.stat().st_size))
+            elif suffix in THUMBNAIL_SUFFIXES:
+                crawlresult['thumbnail'].append(Path(entry.path))
+            else:
+                crawlresult['unrecognized'].append(Path(entry.path))
+
+    # GoPro names are assigned monotonically, so the listing is usually nearly sorted
+    # and this single pass is cheap
+    crawlresult['video'].sort(key=attrgetter('number', 'chapter'))
+
+    video_count = len(crawlresult['video'])
+    thumbnail_count = len(crawlresult['thumbnail'])
+    unrecognized_count = len(crawlresult['unrecognized'])
+    logging.info(f'Crawling {directory} returned {video_count} video files, '
+                 f'{thumbnail_count} thumbnails and {unrecognized_count} unrecognized items.')
+    return crawlresult
 
 
 
@@ -77,16 +86,16 @@ def parse_filename(name: str, /) -> dict[str, str]:
     info : dict
         Parsed file information.
     """
-    prefix, codec, *stem = name
-
-    chapter = ''.join(stem[0:2])
-    number = ''.join(stem[2:6])
-    suffix = ''.join(stem[6:])
+    prefix = name[0]
+    codec = name[1]
+    chapter = name[2:4]
+    number = name[4:8]
+    suffix = name[8:]
 
     if prefix != 'G':
         warnings.warn(f'expected prefix \'G\' but got \'{prefix}\'')
 
-    if codec not in {'H', 'X'}:
+    if codec not in CODEC_SET:
         warnings.warn(f'expected codec \'H\' (AVC) or \'X\' (HEVC) but got {codec}')
 
     if not suffix.lower().endswith('mp4'):
@@ -97,10 +106,18 @@ def parse_filename(name: str, /) -> dict[str, str]:
 
 
 
-def parse_filepath(path: Path) -> dict[str, str | Path]:
-    if not path.exists():
-        warnings.warn(f'video file at "{path.resolve()}" does not exist')
-    raw_fileinfo = {**parse_filename(path.name), 'path' : path}
+def parse_filepath(path: Path, size: int | None = None) -> FileInfo:
+    """
+    Parse a GoPro video file path into a file information object.
+    The file size in bytes is queried from the file system if not provided.
+    It is left as `None` if the file does not exist.
+    """
+    if size is None:
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            warnings.warn(f'video file at "{path.resolve()}" does not exist')
+    raw_fileinfo = {**parse_filename(path.name), 'path' : path, 'size' : size}
     fileinfo = FileInfo(**raw_fileinfo)
     return fileinfo
 
@@ -110,12 +127,16 @@ def accumulate_filenumberwise(fileinfos: Iterable[FileInfo], /) -> dict[str, lis
     """
     Accumulate file information objects with identical file number (but possibly differing chapter)
     to retrieve lists of file information objects that correspond to single recordings.
+    Expects the file information objects sorted by chapter, as returned by `crawl`.
     """
     accumulated_fileinfos = defaultdict(list)
     for fileinfo in fileinfos:
         accumulated_fileinfos[fileinfo.number].append(fileinfo)
     
-    for chapters in accumulated_fileinfos.values():
-        chapters.sort(key=lambda elem: int(elem.chapter))
+    if __debug__:
+        for chapters in accumulated_fileinfos.values():
+            # chapters are fixed-width, zero-padded strings: lexicographic order is numeric order
+            assert all(previous.chapter <= current.chapter for previous, current in zip(chapters, chapters[1:])), \
+                f'chapters of file number {chapters[0].number} are not sorted'
     
-    return accumulated_fileinfos
\ No newline at end of file
+    return dict(accumulated_fileinfos)
\ No newline at end of file
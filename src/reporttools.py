@@ -3,8 +3,6 @@ Tooling for command line reporting of file results.
 
 @js 2023
 """
-import re
-
 from datetime import datetime
 from pathlib import Path
 from rich.table import Table
@@ -15,22 +13,31 @@ from src.filetools import FileInfo
 
 TIMESTAMP_FORMAT: str = '%y-%m-%d :: %H:%M:%S'
 
-byte = re.compile('[bB]')
-kilo = re.compile('[kK]i?[bB]')
-mega = re.compile('[mM]i?[bB]')
-giga = re.compile('[gG]i?[bB]')
+# scaling factors for the upper-cased unit strings: decimal SI and binary IEC prefixes
+SCALING: dict[str, int] = {
+    'B' : 1,
+    'KB' : 1000, 'KIB' : 1024,
+    'MB' : 1000 ** 2, 'MIB' : 1024 ** 2,
+    'GB' : 1000 ** 3, 'GIB' : 1024 ** 3,
+    'TB' : 1000 ** 4, 'TIB' : 1024 ** 4
+}
 
-patterns = {byte : 0, kilo : 1, mega : 2, giga: 3}
+# display form for the upper-cased unit strings
+UNIT_DISPLAY: dict[str, str] = {
+    'B' : 'B',
+    'KB' : 'KB', 'KIB' : 'KiB',
+    'MB' : 'MB', 'MIB' : 'MiB',
+    'GB' : 'GB', 'GIB' : 'GiB',
+    'TB' : 'TB', 'TIB' : 'TiB'
+}
 
 
 
 def format_unit(unit: str, /) -> str:
-    last = len(unit) - 1
-    elements = [
-        char.upper() if i == 0 or i == last else char.lower()
-        for i, char in enumerate(unit)
-    ]
-    return ''.join(elements)
+    try:
+        return UNIT_DISPLAY[unit.upper()]
+    except KeyError:
+        raise ValueError(f'invalid unit specification: \'{unit}\'')
         
 
 def get_scaling(unit: str, /) -> int:
@@ -38,23 +45,25 @@ def get_scaling(unit: str, /) -> int:
     Retrieve the scaling factor by interpreting the unit string.
     Intended for use with numbers of 'byte'.
     """
-    for pattern, exponent in patterns.items():
-        match_result = pattern.match(unit)
-        if match_result:
-            break
-    else:
+    try:
+        return SCALING[unit.upper()]
+    except KeyError:
         raise ValueError(f'invalid unit specification: \'{unit}\'')
     
-    span = match_result.span()
-    length = span[-1] - span[0]
-    base = 1000 if length == 2 else 1024
-    return base ** exponent
-    
     
+def _size(fileinfo: FileInfo, /) -> int:
+    """Retrieve the file size in bytes, failing on unknown sizes."""
+    if fileinfo.size is None:
+        raise ValueError(f'unknown size for video file at \'{fileinfo.path}\'')
+    return fileinfo.size
+
+
+def _format_scaled(bytecount: int, factor: int, unit_display: str) -> str:
+    return f'{bytecount / factor:.2f} {unit_display}'
+
+
 def format_bytecount(bytecount: int, unit: str = 'GiB') -> str:
-    factor = get_scaling(unit)
-    value = bytecount / factor
-    return f'{value:.2f} {format_unit(unit)}'
+    return _format_scaled(bytecount, get_scaling(unit), format_unit(unit))
 
 
 
@@ -67,12 +76,14 @@ def build_tree_report(accumulated_result: dict[str, list[FileInfo]],
     """
     if not timestamp:
         timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+    factor = get_scaling(size_unit)
+    unit_display = format_unit(size_unit)
     base = Tree(f'Summary for directory: [yellow italic]\'{source}\'[/yellow italic] @ {timestamp}')
     for filenumber, subfiles in accumulated_result.items():
         branch = base.add(f'🗄️ stem file [bold green]{filenumber} [/bold green]')
 
         for subfile in subfiles:
-            branch.add(f'🎞️ {subfile.chapter} :: {format_bytecount(subfile.size, unit=size_unit)}')
+            branch.add(f'🎞️ {subfile.chapter} :: {_format_scaled(_size(subfile), factor, unit_display)}')
     
     return base
 
@@ -93,25 +104,35 @@ def build_table_report(accumulated_result: dict[str, list[FileInfo]],
     table.add_column('Chapters', style='green', header_style='bold green')
     table.add_column('Cumulative Size', style='magenta', header_style='bold magenta')
 
+    factor = get_scaling(size_unit)
+    unit_display = format_unit(size_unit)
+
     cumsize = 0
     files = len(accumulated_result)
     min_chapters = float('+inf')
     max_chapters = float('-inf')
 
     for filenumber, subfiles in accumulated_result.items():
-        min_chapters = len(subfiles) if len(subfiles) < min_chapters else min_chapters
-        max_chapters = len(subfiles) if len(subfiles) > max_chapters else max_chapters
-        chapters = ' '.join(str(subfile.chapter) for subfile in subfiles)
-        size = sum(subfile.size for subfile in subfiles)
+        # single pass over the chapter subfiles for size and chapter listing
+        size = 0
+        chapters = []
+        for subfile in subfiles:
+            size += _size(subfile)
+            chapters.append(str(subfile.chapter))
+        count = len(subfiles)
+        if count < min_chapters:
+            min_chapters = count
+        if count > max_chapters:
+            max_chapters = count
         cumsize += size
         table.add_row(
-            str(filenumber), str(chapters), format_bytecount(size, unit=size_unit)
+            str(filenumber), ' '.join(chapters), _format_scaled(size, factor, unit_display)
         )
 
     table.add_section()
 
     table.add_row(f'{files} stem files',
                   f'{min_chapters} to {max_chapters} chapters',
-                  f'{format_bytecount(cumsize, unit=size_unit)}')
+                  f'{_format_scaled(cumsize, factor, unit_display)}')
 
-    return table
\ No newline at end of file
+    return table